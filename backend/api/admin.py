@@ -53,11 +53,12 @@ class RecipesAdmin(admin.ModelAdmin):
     search_fields = ("author__username", "name")
 
     def count_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     count_favorites.short_description = (
         "Количество добавлений рецепта в избранное"
     )
+    count_favorites.admin_order_field = "favorites_count"
 
 
 class TagAdmin(admin.ModelAdmin):
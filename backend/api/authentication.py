@@ -0,0 +1,87 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from rest_framework.authentication import TokenAuthentication
+
+from backend.settings import (
+    AUTH_TOKEN_CACHE_SIZE,
+    AUTH_TOKEN_CACHE_TTL,
+    AUTH_TOKEN_LOCAL_TTL,
+)
+
+TOKEN_KEY = "token:{}"
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш в памяти процесса с временем жизни
+    записей; при переполнении вытесняются давно не использованные."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+tokens = LRUCache(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_LOCAL_TTL)
+
+
+def invalidate_tokens(keys):
+    """Сбрасывает закэшированных пользователей для ключей токенов."""
+    keys = list(keys)
+    for key in keys:
+        tokens.delete(key)
+    cache.delete_many([TOKEN_KEY.format(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который не обращается к БД на каждый запрос.
+
+    Пара (пользователь, токен) хранится в LRU-кэше процесса и в общем
+    кэше Django. При удалении токена или изменении пользователя записи
+    сбрасываются; в других процессах локальная копия живёт не дольше
+    AUTH_TOKEN_LOCAL_TTL секунд.
+    """
+
+    def authenticate_credentials(self, key):
+        # В памяти процесса хранится сериализованная пара, и каждый
+        # запрос получает свои объекты: изменения request.user не
+        # попадают в другие запросы.
+        data = tokens.get(key)
+        if data is None:
+            credentials = cache.get(TOKEN_KEY.format(key))
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                cache.set(
+                    TOKEN_KEY.format(key), credentials, AUTH_TOKEN_CACHE_TTL
+                )
+            data = pickle.dumps(credentials, pickle.HIGHEST_PROTOCOL)
+            tokens.set(key, data)
+        return pickle.loads(data)
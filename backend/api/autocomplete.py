@@ -0,0 +1,79 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.db.models import Count
+
+from api.cache import get_versions
+from backend.settings import INGREDIENTS_INDEX_TTL
+from food.models import Ingredients
+
+
+class IngredientsIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся отсортированными, совпадения по началу строки
+    ищутся бинарным поиском. Индекс перестраивается, когда меняется
+    версия таблицы ингредиентов, а количество использований в рецептах
+    обновляется не реже, чем раз в INGREDIENTS_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.built_at = 0
+        self.data = ([], [])
+
+    def build(self, version):
+        rows = sorted(
+            Ingredients.objects.annotate(usage=Count("in_recipe"))
+            .order_by()
+            .values_list("id", "name", "measurement_unit", "usage"),
+            key=lambda row: row[1].casefold(),
+        )
+        entries = [
+            (
+                -usage,
+                name,
+                id,
+                {"id": id, "name": name, "measurement_unit": unit},
+            )
+            for id, name, unit, usage in rows
+        ]
+        self.data = ([name.casefold() for _, name, _, _ in entries], entries)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def is_stale(self, version):
+        return (
+            version != self.version
+            or time.monotonic() - self.built_at > INGREDIENTS_INDEX_TTL
+        )
+
+    def refresh(self):
+        (version,) = get_versions(("ingredients",))
+        if not self.is_stale(version):
+            return
+        with self.lock:
+            if self.is_stale(version):
+                self.build(version)
+
+    def search(self, query, limit):
+        """Сначала совпадения по началу названия, затем по подстроке;
+        внутри каждой группы популярные в рецептах ингредиенты выше."""
+        self.refresh()
+        keys, entries = self.data
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + "\uffff", start)
+        found = sorted(entries[start:end])[:limit]
+        if len(found) < limit:
+            found += sorted(
+                entry
+                for key, entry in zip(keys, entries)
+                if query in key and not key.startswith(query)
+            )[: limit - len(found)]
+        return [item for _, _, _, item in found]
+
+
+ingredients_index = IngredientsIndex()
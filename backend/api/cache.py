@@ -0,0 +1,85 @@
+import time
+
+from django.core.cache import cache
+
+from backend.settings import RECIPE_CACHE_TIMEOUT
+
+RECIPE_VERSION_KEY = "recipe:{}:version"
+RECIPE_DOCUMENT_KEY = "recipe:{}:{}"
+VERSION_KEY = "version:{}"
+USER_VERSION = "user:{}"
+CART_VERSION = "cart:{}"
+
+
+def get_cached_versions(keys):
+    """Версии по ключам кэша; отсутствующие создаются заново.
+
+    Версия — время изменения в наносекундах, поэтому её можно
+    использовать и как дату последнего изменения.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key in versions:
+            continue
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+        versions[key] = version
+    return versions
+
+
+def get_versions(names):
+    """Версии таблиц или пользовательских списков по их именам."""
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = get_cached_versions(keys)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(names):
+    version = time.time_ns()
+    cache.set_many(
+        {VERSION_KEY.format(name): version for name in names}, None
+    )
+
+
+def get_recipe_versions(recipe_ids):
+    """Текущие версии представлений рецептов."""
+    keys = {RECIPE_VERSION_KEY.format(recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    return {
+        keys[key]: version
+        for key, version in get_cached_versions(list(keys)).items()
+    }
+
+
+def get_recipe_documents(versions):
+    """Закэшированные представления рецептов для указанных версий."""
+    keys = {
+        RECIPE_DOCUMENT_KEY.format(recipe_id, version): recipe_id
+        for recipe_id, version in versions.items()
+    }
+    return {
+        keys[key]: document
+        for key, document in cache.get_many(keys).items()
+    }
+
+
+def set_recipe_documents(documents, versions):
+    cache.set_many(
+        {
+            RECIPE_DOCUMENT_KEY.format(recipe_id, versions[recipe_id]): (
+                document
+            )
+            for recipe_id, document in documents.items()
+        },
+        RECIPE_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_recipes(recipe_ids):
+    """Сбрасывает версии рецептов, старые представления становятся
+    недоступны и вытесняются из кэша по таймауту."""
+    cache.delete_many(
+        [RECIPE_VERSION_KEY.format(recipe_id) for recipe_id in recipe_ids]
+    )
+    bump_versions(("recipes",))
@@ -0,0 +1,95 @@
+import gzip
+import threading
+from hashlib import sha1
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from rest_framework.renderers import JSONRenderer
+
+from api.cache import get_versions
+from food.models import Ingredients
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPE_JSON = "application/json"
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, которые клиент не запретил через q=0."""
+    encodings = set()
+    for item in header.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class IngredientsCatalog:
+    """Полный список ингредиентов, заранее сериализованный и сжатый.
+
+    Тело ответа и его gzip/brotli варианты собираются один раз на версию
+    таблицы ингредиентов и отдаются без сериализации.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.variants = {}
+
+    def build(self, version):
+        body = JSONRenderer().render(
+            list(
+                Ingredients.objects.values("id", "name", "measurement_unit")
+            )
+        )
+        etag = sha1(body).hexdigest()
+        variants = {None: (body, f'"{etag}"')}
+        variants["gzip"] = (gzip.compress(body, 9), f'"{etag}-gzip"')
+        if brotli is not None:
+            variants["br"] = (brotli.compress(body), f'"{etag}-br"')
+        self.variants = variants
+        self.version = version
+
+    def get_variants(self):
+        (version,) = get_versions(("ingredients",))
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.build(version)
+        return self.variants
+
+    def response(self, request):
+        variants = self.get_variants()
+        encodings = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        encoding = next(
+            (name for name in ("br", "gzip") if name in variants
+             and name in encodings),
+            None,
+        )
+        body, etag = variants[encoding]
+        if etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=CONTENT_TYPE_JSON)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+ingredients_catalog = IngredientsCatalog()
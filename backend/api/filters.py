@@ -1,30 +1,115 @@
+from django import forms
+from django.db.models import Exists, OuterRef
+from django.utils.datastructures import MultiValueDict
+
 from django_filters import rest_framework as filters
+from django_filters.widgets import BaseCSVWidget
+
+from food.models import Favorite, Recipes, ShoppingCart, Tag
+from food.search import search_recipes
+
+TAGS_ANY = "any"
+TAGS_ALL = "all"
+
+
+class MultipleCSVWidget(BaseCSVWidget, forms.TextInput):
+    """Значения списком: ?author=1,2 или ?author=1&author=2."""
+
+    def value_from_datadict(self, data, files, name):
+        if isinstance(data, MultiValueDict):
+            values = data.getlist(name)
+        else:
+            values = [data.get(name) or ""]
+        return [
+            value.strip()
+            for item in values
+            for value in item.split(",")
+            if value.strip()
+        ]
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
-from food.models import Recipes, Tag
+
+def filter_exists(queryset, name, subquery):
+    """Фильтр через коррелированный EXISTS вместо JOIN.
+
+    Если во view уже есть аннотация с таким именем, используется она.
+    """
+    if name not in queryset.query.annotations:
+        queryset = queryset.annotate(**{name: Exists(subquery)})
+    return queryset.filter(**{name: True})
 
 
 class RecipesFilter(filters.FilterSet):
     is_in_shopping_cart = filters.CharFilter(method="get_is_in_shopping_cart")
     is_favorited = filters.CharFilter(method="get_is_favorited")
-    author = filters.CharFilter(
-        field_name="author__id", lookup_expr="contains"
+    author = NumberInFilter(
+        field_name="author_id", lookup_expr="in", widget=MultipleCSVWidget
     )
     tags = filters.ModelMultipleChoiceFilter(
         field_name="tags__slug",
         to_field_name="slug",
         queryset=Tag.objects.all(),
+        method="get_tags",
     )
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_ANY, "Любой из тегов"), (TAGS_ALL, "Все теги")),
+        method="get_tags_mode",
+    )
+    search = filters.CharFilter(method="get_search")
 
     class Meta:
         model = Recipes
         fields = ("author", "tags")
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        if value == "1":
-            return queryset.filter(shopping_cart__user=self.request.user)
-        return queryset
+        if value != "1":
+            return queryset
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        return filter_exists(
+            queryset,
+            "is_in_shopping_cart",
+            ShoppingCart.objects.filter(
+                user=self.request.user, recipe=OuterRef("pk")
+            ),
+        )
 
     def get_is_favorited(self, queryset, name, value):
-        if value == "1":
-            return queryset.filter(favorites__user=self.request.user)
+        if value != "1":
+            return queryset
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        return filter_exists(
+            queryset,
+            "is_favorited",
+            Favorite.objects.filter(
+                user=self.request.user, recipe=OuterRef("pk")
+            ),
+        )
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        recipe_tags = Recipes.tags.through.objects.filter(
+            recipes=OuterRef("pk")
+        )
+        if self.form.cleaned_data.get("tags_mode") != TAGS_ALL:
+            return filter_exists(
+                queryset,
+                "has_tags",
+                recipe_tags.filter(tag__in=[tag.id for tag in value]),
+            )
+        for tag in value:
+            queryset = filter_exists(
+                queryset, f"has_tag_{tag.id}", recipe_tags.filter(tag=tag)
+            )
+        return queryset
+
+    def get_tags_mode(self, queryset, name, value):
         return queryset
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,85 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from api.cache import USER_VERSION, get_versions
+from api.uploads import FileTooLarge, LimitedTemporaryFileUploadHandler
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы (ETag / Last-Modified) для list и retrieve.
+
+    Валидаторы строятся по версиям таблиц из etag_versions и, если
+    user_dependent, по версии избранного, списка покупок и подписок
+    пользователя, поэтому ответ 304 отдается без обращения к БД.
+    """
+
+    etag_versions = ()
+    user_dependent = False
+
+    def get_validators(self, request):
+        names = list(self.etag_versions)
+        user_id = None
+        if self.user_dependent and request.user.is_authenticated:
+            user_id = request.user.id
+            names.append(USER_VERSION.format(user_id))
+        versions = get_versions(names)
+        key = "|".join(
+            map(
+                str,
+                (
+                    request.get_full_path(),
+                    request.accepted_media_type,
+                    user_id,
+                    *versions,
+                ),
+            )
+        )
+        etag = f'"{md5(key.encode()).hexdigest()}"'
+        return etag, max(versions) // 10 ** 9
+
+    def conditional_response(self, request, action, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = action(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        if self.user_dependent:
+            patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class LimitedUploadMixin:
+    """Загрузка файлов с ограничением размера во время приёма.
+
+    Обработчик ставится только для этого view, остальной сайт, включая
+    админку, использует обработчики Django по умолчанию.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ("POST", "PUT", "PATCH"):
+            # Тело разбирается здесь, чтобы обработчик успел отметить
+            # превышение размера до валидации.
+            request.FILES
+            if getattr(request._request, "upload_too_large", False):
+                raise FileTooLarge()
@@ -1,5 +1,148 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from backend.settings import CURSOR_PAGE_SIZE
+
+
+class CountPkPaginator(Paginator):
+    """Считает только первичные ключи.
+
+    Аннотации queryset (флаги пользователя, EXISTS-фильтры) не попадают
+    в SELECT запроса COUNT и не порождают GROUP BY по каждой строке.
+    """
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, "values"):
+            return self.object_list.values("pk").count()
+        return len(self.object_list)
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу последней записи (без COUNT и OFFSET).
+
+    Курсор хранит значения полей сортировки последней выданной записи,
+    следующая страница выбирается условием по этим полям, поэтому
+    глубокие страницы стоят столько же, сколько первая.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = CURSOR_PAGE_SIZE
+    ordering = ("-id",)
+    invalid_cursor_message = "Неверный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, "cursor_ordering", self.ordering)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        page = list(queryset[: page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def get_position_filter(self, position):
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = self.fields[index]
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": position[index]})
+            for prev_name, prev_value in zip(self.fields, position[:index]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (DecodeError, TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        values = [
+            force_str(getattr(instance, name)) for name in self.fields
+        ]
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+
+class FeedPagination(KeysetPagination):
+    """Курсор по записям ленты подписок: страница читается одним
+    диапазоном индекса (user, -pub_date, -id)."""
+
+    ordering = ("-pub_date", "-id")
+
+
+class PantryPagination(PageNumberPagination):
+    """Страницы списка рецептов, подобранных по продуктам."""
+
+    page_size = CURSOR_PAGE_SIZE
+    page_size_query_param = "limit"
 
 
 class LimitPageNumberPagination(PageNumberPagination):
+    """Постраничный вывод с параметром limit.
+
+    Если в запросе передан параметр cursor (для первой страницы пустой),
+    выдача переключается на KeysetPagination.
+    """
+
     page_size_query_param = "limit"
+    django_paginator_class = CountPkPaginator
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,212 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import chain, takewhile
+
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.settings import (
+    PANTRY_INDEX_TTL,
+    PANTRY_LOG_LIMIT,
+    PANTRY_LOG_TIMEOUT,
+)
+from food.models import IngredientsRecipe
+from food.tasks import BackgroundPool
+
+SEQUENCE_KEY = "pantry:sequence"
+LOG_KEY = "pantry:log:{}"
+
+pool = BackgroundPool("pantry", 1)
+
+
+def get_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def log_changes(recipe_ids):
+    """Записывает в общий кэш очередное изменение: индексы всех
+    процессов перечитают ингредиенты этих рецептов."""
+    cache.add(SEQUENCE_KEY, 0, None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(LOG_KEY.format(sequence), recipe_ids, PANTRY_LOG_TIMEOUT)
+
+
+def changed_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(partial(log_changes, recipe_ids))
+
+
+def load_ingredients(recipe_ids=None):
+    """Ингредиенты рецептов в виде {id рецепта: [id ингредиентов]}."""
+    rows = IngredientsRecipe.objects.order_by()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    recipes = defaultdict(list)
+    for recipe_id, ingredient_id in rows.values_list(
+        "recipe_id", "ingredient_id"
+    ).iterator():
+        recipes[recipe_id].append(ingredient_id)
+    return recipes
+
+
+class PantryIndex:
+    """Инвертированный индекс рецептов по ингредиентам в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов,
+    для каждого рецепта — id его ингредиентов. Изменения ингредиентов
+    рецептов попадают в журнал в общем кэше (log_changes), и индекс
+    перечитывает только упомянутые там рецепты. Если журнал потерян или
+    слишком длинный, а также не реже, чем раз в PANTRY_INDEX_TTL секунд,
+    индекс перестраивается в фоне; запросы тем временем читают прежний
+    снимок.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.sequence = None
+        self.built_at = 0
+        self.data = ({}, {})
+
+    def build(self):
+        sequence = get_sequence()
+        recipes = load_ingredients()
+        postings = defaultdict(list)
+        for recipe_id, ingredient_ids in recipes.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].append(recipe_id)
+        data = (
+            {
+                ingredient_id: array("l", sorted(recipe_ids))
+                for ingredient_id, recipe_ids in postings.items()
+            },
+            {
+                recipe_id: tuple(ingredient_ids)
+                for recipe_id, ingredient_ids in recipes.items()
+            },
+        )
+        with self.lock:
+            # Изменения после чтения номера применятся повторно,
+            # перечитывание рецепта идемпотентно.
+            self.data = data
+            self.sequence = sequence
+            self.built_at = time.monotonic()
+
+    def rebuild(self):
+        try:
+            self.build()
+        finally:
+            self.build_lock.release()
+
+    def schedule_build(self):
+        if self.build_lock.acquire(blocking=False):
+            pool.submit(self.rebuild)
+
+    def apply(self, recipe_ids):
+        """Перечитывает ингредиенты рецептов. Словари и затронутые
+        массивы копируются, чтобы параллельные запросы читали
+        согласованный снимок."""
+        current = load_ingredients(recipe_ids)
+        postings, recipes = self.data
+        postings, recipes = dict(postings), dict(recipes)
+        copied = set()
+
+        def get_posting(ingredient_id):
+            if ingredient_id not in copied:
+                copied.add(ingredient_id)
+                postings[ingredient_id] = array(
+                    "l", postings.get(ingredient_id, ())
+                )
+            return postings[ingredient_id]
+
+        for recipe_id in recipe_ids:
+            for ingredient_id in recipes.pop(recipe_id, ()):
+                posting = get_posting(ingredient_id)
+                index = bisect_left(posting, recipe_id)
+                if index < len(posting) and posting[index] == recipe_id:
+                    del posting[index]
+            if recipe_id in current:
+                recipes[recipe_id] = tuple(current[recipe_id])
+                for ingredient_id in current[recipe_id]:
+                    insort(get_posting(ingredient_id), recipe_id)
+        self.data = (postings, recipes)
+
+    def update(self, sequence):
+        if (
+            sequence < self.sequence
+            or sequence - self.sequence > PANTRY_LOG_LIMIT
+        ):
+            self.schedule_build()
+            return
+        keys = [
+            LOG_KEY.format(number)
+            for number in range(self.sequence + 1, sequence + 1)
+        ]
+        entries = cache.get_many(keys)
+        applied = list(takewhile(lambda key: key in entries, keys))
+        if len(applied) < len(entries):
+            # Пропуск в середине журнала: запись вытеснена из кэша.
+            # Пропуск в конце означает, что запись еще не сделана.
+            self.schedule_build()
+            return
+        if applied:
+            self.apply(
+                set(chain.from_iterable(entries[key] for key in applied))
+            )
+            self.sequence += len(applied)
+
+    def refresh(self):
+        if self.sequence is None:
+            with self.build_lock:
+                if self.sequence is None:
+                    self.build()
+            return
+        if time.monotonic() - self.built_at > PANTRY_INDEX_TTL:
+            self.schedule_build()
+        sequence = get_sequence()
+        if sequence == self.sequence:
+            return
+        # Журнал применяет один поток, остальные отвечают по снимку.
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.update(sequence)
+        finally:
+            self.lock.release()
+
+    def search(self, ingredient_ids, missing=None):
+        """Рецепты, в которых есть хотя бы один из ингредиентов, в виде
+        (id рецепта, найдено, всего ингредиентов).
+
+        Совпадения считаются одним проходом Counter по массивам
+        ингредиентов (цикл подсчета выполняется в C). Сначала рецепты
+        с большей долей имеющихся ингредиентов, затем с меньшим числом
+        недостающих, затем новые.
+        """
+        self.refresh()
+        postings, recipes = self.data
+        matched = Counter(
+            chain.from_iterable(
+                postings.get(ingredient_id, ())
+                for ingredient_id in set(ingredient_ids)
+            )
+        )
+        found = []
+        for recipe_id, count in matched.items():
+            total = len(recipes[recipe_id])
+            if missing is None or total - count <= missing:
+                found.append((recipe_id, count, total))
+        found.sort(
+            key=lambda item: (
+                -item[1] / item[2], item[2] - item[1], -item[0]
+            )
+        )
+        return found
+
+
+pantry_index = PantryIndex()
@@ -3,6 +3,7 @@ import base64
 from django.core.files.base import ContentFile
 from django.core.validators import MinValueValidator
 from django.db import transaction
+from django.db.models import Manager, Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 
 from djoser.serializers import UserCreateSerializer, UserSerializer
@@ -10,7 +11,21 @@ from rest_framework import serializers, status
 from rest_framework.response import Response
 from rest_framework.validators import UniqueTogetherValidator
 
-from backend.settings import MIN_TIME, MIN_AMOUNT, MIN_TAG_NUMBER
+from api.cache import (
+    get_recipe_documents,
+    get_recipe_versions,
+    set_recipe_documents,
+)
+from api.pantry import changed_on_commit as pantry_changed_on_commit
+from api.uploads import IMAGE_TOO_LARGE_MESSAGE, validate_image_file
+from backend.settings import (
+    MAX_IMAGE_SIZE,
+    MIN_TIME,
+    MIN_AMOUNT,
+    MIN_TAG_NUMBER,
+    PANTRY_MAX_INGREDIENTS,
+)
+from food.images import get_variants
 from food.models import (
     Favorite,
     Ingredients,
@@ -21,14 +36,62 @@ from food.models import (
     Tag,
     User
 )
+from food.shopping_lists import (
+    get_recipe_cart_user_ids,
+    refresh_shopping_lists,
+)
+
+RECIPES_PREFETCH = (
+    "tags",
+    Prefetch(
+        "recipe",
+        queryset=IngredientsRecipe.objects.select_related("ingredient"),
+    ),
+)
+
+
+def get_srcset(recipe, context):
+    """Строки srcset для картинки рецепта и её WebP-вариантов."""
+    variants = get_variants(recipe)
+    if variants is None:
+        return None
+    storage = recipe.image.storage
+    request = context.get("request")
+    srcset = {}
+    for key, images in variants.items():
+        urls = []
+        for name, width in images:
+            url = storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls.append(f"{url} {width}w")
+        srcset[key] = ", ".join(urls)
+    return srcset
+
+
+def get_absolute_srcset(srcset, request):
+    """Делает абсолютными ссылки в строках srcset."""
+    absolute = {}
+    for key, value in srcset.items():
+        entries = []
+        for entry in value.split(", "):
+            url, width = entry.rsplit(" ", 1)
+            entries.append(f"{request.build_absolute_uri(url)} {width}")
+        absolute[key] = ", ".join(entries)
+    return absolute
 
 
 class RecipesUserSerializer(serializers.ModelSerializer):
     """Сокращенное представление информации о рецептах."""
 
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipes
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_srcset", "cooking_time")
+
+    def get_image_srcset(self, obj):
+        return get_srcset(obj, self.context)
 
 
 class SubscriptionsListSerializer(serializers.ModelSerializer):
@@ -56,9 +119,11 @@ class SubscriptionsListSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         context = self.context
         request = context.get("request")
         if request.user.is_authenticated:
@@ -68,14 +133,33 @@ class SubscriptionsListSerializer(serializers.ModelSerializer):
         return False
 
     def get_recipes(self, obj):
-        request = self.context["request"]
-        limit = request.GET.get("recipes_limit")
-        queryset = obj.recipes.all()
-        if limit:
-            queryset = queryset[: int(limit)]
+        if hasattr(obj, "limited_recipes"):
+            queryset = obj.limited_recipes
+        else:
+            queryset = obj.recipes.all()
+            limit = self.context.get("recipes_limit")
+            if limit is not None:
+                queryset = queryset[:limit]
         return RecipesUserSerializer(queryset, many=True).data
 
 
+class RecipesLimitSerializer(serializers.Serializer):
+    """Проверка параметра recipes_limit списка подписок."""
+
+    recipes_limit = serializers.IntegerField(min_value=0, required=False)
+
+
+class PantrySerializer(serializers.Serializer):
+    """Проверка параметров подбора рецептов по имеющимся продуктам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=PANTRY_MAX_INGREDIENTS,
+    )
+    missing = serializers.IntegerField(min_value=0, required=False)
+
+
 class SubscriptionsIdSerializer(serializers.ModelSerializer):
     """Сериализатор для информации о пользователе на которого подписались."""
 
@@ -101,9 +185,11 @@ class SubscriptionsIdSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         current_user = self.context["user"]
         return Subscriptions.objects.filter(
             user=current_user, author=obj.id
@@ -149,8 +235,9 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         return data
 
     def to_representation(self, instance):
-        author_id = instance.author.id
-        author = get_object_or_404(User, id=author_id)
+        author = instance.author
+        # Представление строится по только что созданной подписке.
+        author.is_subscribed = True
         user = self.instance.user
         serializer = SubscriptionsIdSerializer(author, context={"user": user})
         return serializer.data
@@ -190,9 +277,14 @@ class UserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        context = self.context
-        user = context["request"].user
-        if user.is_authenticated:
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
+        request = self.context.get("request")
+        if request is None:
+            return False
+        user = request.user
+        # На самого себя подписаться нельзя.
+        if user.is_authenticated and user.id != obj.id:
             author = obj.id
             return Subscriptions.objects.filter(
                 user=user, author=author
@@ -277,13 +369,20 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Обработка изображения кодирование Base64."""
+    """Обработка изображения кодирование Base64.
+
+    Принимает и обычный файл из multipart-запроса.
+    """
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
             format, imgstr = data.split(";base64,")
+            if len(imgstr) * 3 // 4 > MAX_IMAGE_SIZE:
+                raise serializers.ValidationError(IMAGE_TOO_LARGE_MESSAGE)
             ext = format.split("/")[-1]
             data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+        if hasattr(data, "size") and hasattr(data, "seek"):
+            validate_image_file(data)
 
         return super().to_internal_value(data)
 
@@ -301,8 +400,20 @@ class TagSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipesListSerializer(serializers.ListSerializer):
+    """Вывод списка рецептов с пакетным чтением представлений из кэша."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representation_many(list(iterable))
+
+
 class RecipesSerializer(serializers.ModelSerializer):
-    """Сериализатор для вывода информации о списке или отдельном рецепте."""
+    """Сериализатор для вывода информации о списке или отдельном рецепте.
+
+    Общая для всех пользователей часть представления кэшируется по id и
+    версии рецепта, персональные флаги подставляются при каждом ответе.
+    """
 
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True)
@@ -313,6 +424,7 @@ class RecipesSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name="get_is_in_shopping_cart"
     )
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipes
@@ -326,14 +438,90 @@ class RecipesSerializer(serializers.ModelSerializer):
             "name",
             "text",
             "image",
+            "image_srcset",
             "cooking_time",
         )
+        list_serializer_class = RecipesListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, instances):
+        for recipe in instances:
+            if hasattr(recipe, "author_is_subscribed"):
+                recipe.author.is_subscribed = recipe.author_is_subscribed
+        versions = get_recipe_versions(recipe.id for recipe in instances)
+        documents = get_recipe_documents(versions)
+        missing = [
+            recipe for recipe in instances if recipe.id not in documents
+        ]
+        if missing:
+            # Строки могли измениться до чтения версий, поэтому под
+            # текущими версиями кэшируются перечитанные данные.
+            rows = (
+                Recipes.objects.select_related("author")
+                .defer("search_vector")
+                .in_bulk([recipe.id for recipe in missing])
+            )
+            prefetch_related_objects(list(rows.values()), *RECIPES_PREFETCH)
+            fresh = {
+                recipe_id: self.build_document(row)
+                for recipe_id, row in rows.items()
+            }
+            set_recipe_documents(fresh, versions)
+            documents.update(fresh)
+            # Удаленные за это время рецепты отдаются по загруженным
+            # данным без записи в кэш.
+            deleted = [recipe for recipe in missing if recipe.id not in rows]
+            prefetch_related_objects(deleted, *RECIPES_PREFETCH)
+            for recipe in deleted:
+                documents[recipe.id] = self.build_document(recipe)
+        return [
+            self.add_user_flags(documents[recipe.id], recipe)
+            for recipe in instances
+        ]
+
+    @staticmethod
+    def build_document(recipe):
+        """Общая для всех пользователей часть представления.
+
+        Строится без запроса в контексте: флаги пользователя не
+        вычисляются, ссылки на картинки остаются относительными и не
+        зависят от хоста первого запроса.
+        """
+        serializer = RecipesSerializer(context={})
+        return super(RecipesSerializer, serializer).to_representation(recipe)
+
+    def add_user_flags(self, document, recipe):
+        """Флаги пользователя и абсолютные ссылки для текущего ответа."""
+        data = dict(document)
+        request = self.context.get("request")
+        if request is not None:
+            if data["image"]:
+                data["image"] = request.build_absolute_uri(data["image"])
+            if data["image_srcset"]:
+                data["image_srcset"] = get_absolute_srcset(
+                    data["image_srcset"], request
+                )
+        data["author"] = dict(
+            data["author"],
+            is_subscribed=self.fields["author"].get_is_subscribed(
+                recipe.author
+            ),
+        )
+        data["is_favorited"] = self.get_is_favorited(recipe)
+        data["is_in_shopping_cart"] = self.get_is_in_shopping_cart(recipe)
+        return data
+
+    def get_image_srcset(self, obj):
+        return get_srcset(obj, self.context)
 
     def get_is_favorited(self, obj):
-        context = self.context
-        if "request" in context:
-            user = context["request"].user
-        if user.is_authenticated:
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated:
+            user = request.user
             recipe = obj.id
             return Favorite.objects.filter(
                 user=user, recipe_id=recipe
@@ -341,10 +529,11 @@ class RecipesSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
-        context = self.context
-        if "request" in context:
-            user = context["request"].user
-        if user.is_authenticated:
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated:
+            user = request.user
             recipe = obj.id
             return ShoppingCart.objects.filter(
                 user=user, recipe_id=recipe
@@ -386,18 +575,13 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
         tag_data = validated_data.pop("tags")
         new_recipe = Recipes.objects.create(**validated_data)
         new_recipe.tags.set(tag_data)
-        for ingredient in ingredients_data:
-            IngredientsRecipe.objects.create(
-                recipe=new_recipe,
-                ingredient=get_object_or_404(
-                    Ingredients,
-                    id=ingredient.get("id")), amount=ingredient.get("amount"))
+        self.create_ingredients(new_recipe, ingredients_data)
         return new_recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop("recipe")
-        tag_data = validated_data.pop("tags")
+        ingredients_data = validated_data.pop("recipe", None)
+        tag_data = validated_data.pop("tags", None)
         instance.pub_date = validated_data.get("pub_date", instance.pub_date)
         instance.name = validated_data.get("name", instance.name)
         instance.image = validated_data.get("image", instance.image)
@@ -406,23 +590,24 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
             "cooking_time", instance.cooking_time
         )
         instance.save()
-        IngredientsRecipe.objects.filter(
-            recipe_id=instance.id).delete()
-        for ingredient in ingredients_data:
-            IngredientsRecipe.objects.create(
-                recipe_id=instance.id,
-                ingredient=get_object_or_404(
-                    Ingredients,
-                    id=ingredient.get("id")), amount=ingredient.get("amount"),)
-        instance.tags.set(tag_data)
+        if tag_data is not None:
+            self.update_tags(instance, tag_data)
+        if ingredients_data is not None:
+            ingredient_ids = self.update_ingredients(
+                instance, ingredients_data
+            )
+            if ingredient_ids:
+                refresh_shopping_lists(
+                    get_recipe_cart_user_ids(instance.id), ingredient_ids
+                )
         return instance
 
     def validate(self, data):
-        if not data.get("tags") or len(data.get("tags")) == 0:
+        if (not self.partial or "tags" in data) and not data.get("tags"):
             raise serializers.ValidationError(
                 f"Должен быть хотя бы {MIN_TAG_NUMBER} тег"
             )
-        if not data.get("recipe"):
+        if (not self.partial or "recipe" in data) and not data.get("recipe"):
             raise serializers.ValidationError(
                 f"Должен быть хотя бы {MIN_AMOUNT} ингредиент")
         if data.get("recipe"):
@@ -440,8 +625,85 @@ class RecipesCreateSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError(
                         "Нельзя добавлять одинаковые ингредиенты")
                 ing_list.append(ing_id)
+            found = Ingredients.objects.in_bulk(ing_list)
+            missing = [ing_id for ing_id in ing_list if ing_id not in found]
+            if missing:
+                raise serializers.ValidationError(
+                    "Ингредиенты не найдены: "
+                    + ", ".join(str(ing_id) for ing_id in missing)
+                )
         return data
 
+    @staticmethod
+    def create_ingredients(recipe, ingredients_data):
+        """Записывает ингредиенты рецепта одним INSERT.
+
+        bulk_create не отправляет post_save, кэш рецепта сбрасывается
+        сигналом сохранения самого рецепта, а индекс продуктов
+        обновляется явно.
+        """
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient.get("id"),
+                amount=ingredient.get("amount"),
+            )
+            for ingredient in ingredients_data
+        )
+        pantry_changed_on_commit((recipe.id,))
+
+    @classmethod
+    def update_ingredients(cls, recipe, ingredients_data):
+        """Применяет к ингредиентам рецепта только нужные изменения.
+
+        Возвращает id ингредиентов, которые были добавлены или изменили
+        количество: bulk_create и bulk_update не отправляют сигналов,
+        и списки покупок по ним пересчитываются явно. Удаленные строки
+        пересчитывает сигнал post_delete.
+        """
+        amounts = {
+            ingredient.get("id"): ingredient.get("amount")
+            for ingredient in ingredients_data
+        }
+        current = {
+            row.ingredient_id: row
+            for row in IngredientsRecipe.objects.filter(recipe=recipe)
+        }
+        removed = [
+            row.id for ingredient_id, row in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            {"id": ingredient_id, "amount": amount}
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if removed:
+            IngredientsRecipe.objects.filter(id__in=removed).delete()
+        if changed:
+            IngredientsRecipe.objects.bulk_update(changed, ("amount",))
+        if added:
+            cls.create_ingredients(recipe, added)
+        return (
+            {row.ingredient_id for row in changed}
+            | {ingredient["id"] for ingredient in added}
+        )
+
+    @staticmethod
+    def update_tags(recipe, tags):
+        current = set(recipe.tags.values_list("id", flat=True))
+        new = {tag.id for tag in tags}
+        if current - new:
+            recipe.tags.remove(*(current - new))
+        if new - current:
+            recipe.tags.add(*(new - current))
+
     def to_representation(self, instance):
         recipe_id = instance.id
         recipe = get_object_or_404(Recipes, id=recipe_id)
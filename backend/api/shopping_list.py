@@ -0,0 +1,195 @@
+import csv
+import json
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db.models import F
+
+from api.cache import CART_VERSION, get_versions
+from backend.settings import SHOPPING_LIST_CACHE_TIMEOUT
+from food.models import IngredientsRecipe, ShoppingListItem
+
+SHOPPING_LIST_KEY = "shopping_list:{}:{}:{}:{}:{}"
+
+CONTENT_TYPE_TEXT = "text/plain; charset=UTF-8"
+CONTENT_TYPE_CSV = "text/csv; charset=UTF-8"
+CONTENT_TYPE_JSON = "application/json; charset=UTF-8"
+
+
+def get_totals(user):
+    """Суммарное количество каждого ингредиента из
+    материализованного списка покупок пользователя."""
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .order_by("ingredient__name", "ingredient_id")
+        .values(
+            "ingredient_id",
+            name=F("ingredient__name"),
+            measurement_unit=F("ingredient__measurement_unit"),
+            total=F("amount"),
+        )
+    )
+
+
+def get_shopping_list(user):
+    return [
+        {
+            "id": row["ingredient_id"],
+            "name": row["name"],
+            "measurement_unit": row["measurement_unit"],
+            "amount": row["total"],
+        }
+        for row in get_totals(user)
+    ]
+
+
+def get_breakdown(user):
+    """Ингредиенты каждого рецепта из списка покупок одним запросом."""
+    return (
+        IngredientsRecipe.objects.filter(recipe__shopping_cart__user=user)
+        .order_by("recipe__name", "recipe_id", "ingredient__name")
+        .values(
+            "recipe_id",
+            "amount",
+            recipe_name=F("recipe__name"),
+            name=F("ingredient__name"),
+            measurement_unit=F("ingredient__measurement_unit"),
+        )
+    )
+
+
+def group_by_recipe(rows):
+    recipe_id, ingredients = None, []
+    for row in rows:
+        if ingredients and row["recipe_id"] != recipe_id:
+            yield ingredients[0]["recipe_name"], ingredients
+            ingredients = []
+        recipe_id = row["recipe_id"]
+        ingredients.append(row)
+    if ingredients:
+        yield ingredients[0]["recipe_name"], ingredients
+
+
+def render_text(totals, breakdown):
+    for row in totals:
+        yield f"{row['name']} ({row['measurement_unit']}) - {row['total']}\n"
+    if breakdown is None:
+        return
+    for recipe, ingredients in group_by_recipe(breakdown):
+        yield f"\n{recipe}:\n"
+        for row in ingredients:
+            yield (
+                f"  {row['name']} ({row['measurement_unit']}) - "
+                f"{row['amount']}\n"
+            )
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(totals, breakdown):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ("Рецепт", "Ингредиент", "Ед. измерения", "Количество")
+    )
+    for row in totals:
+        yield writer.writerow(
+            ("", row["name"], row["measurement_unit"], row["total"])
+        )
+    if breakdown is None:
+        return
+    for row in breakdown:
+        yield writer.writerow(
+            (
+                row["recipe_name"],
+                row["name"],
+                row["measurement_unit"],
+                row["amount"],
+            )
+        )
+
+
+def dump_items(items):
+    for index, item in enumerate(items):
+        yield ("," if index else "") + json.dumps(item, ensure_ascii=False)
+
+
+def ingredient_item(row, amount_field="amount"):
+    return {
+        "name": row["name"],
+        "measurement_unit": row["measurement_unit"],
+        "amount": row[amount_field],
+    }
+
+
+def render_json(totals, breakdown):
+    yield '{"ingredients":['
+    yield from dump_items(ingredient_item(row, "total") for row in totals)
+    yield "]"
+    if breakdown is not None:
+        yield ',"recipes":['
+        yield from dump_items(
+            {
+                "name": recipe,
+                "ingredients": [
+                    ingredient_item(row) for row in ingredients
+                ],
+            }
+            for recipe, ingredients in group_by_recipe(breakdown)
+        )
+        yield "]"
+    yield "}"
+
+
+FORMATS = {
+    "txt": (CONTENT_TYPE_TEXT, render_text),
+    "csv": (CONTENT_TYPE_CSV, render_csv),
+    "json": (CONTENT_TYPE_JSON, render_json),
+}
+
+
+def render_shopping_list(user, file_type, detailed=False):
+    """Генератор частей файла со списком покупок в выбранном формате."""
+    _, render = FORMATS[file_type]
+    totals = get_totals(user).iterator()
+    breakdown = get_breakdown(user).iterator() if detailed else None
+    return render(totals, breakdown)
+
+
+def get_download_key(user, file_type, detailed=False):
+    """Ключ кэша файла: меняется вместе с версией списка покупок
+    пользователя и версией таблицы ингредиентов."""
+    cart_version, ingredients_version = get_versions(
+        (CART_VERSION.format(user.id), "ingredients")
+    )
+    return SHOPPING_LIST_KEY.format(
+        user.id, cart_version, ingredients_version, file_type, int(detailed)
+    )
+
+
+def get_download_etag(key):
+    return f'"{md5(key.encode()).hexdigest()}"'
+
+
+def cache_chunks(key, chunks):
+    """Отдает части файла и сохраняет файл целиком в кэш."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, "".join(parts), SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def get_download(user, file_type, detailed=False, key=None):
+    """Готовый файл из кэша или генератор, который его сформирует."""
+    key = key or get_download_key(user, file_type, detailed)
+    content = cache.get(key)
+    if content is not None:
+        return (content,)
+    return cache_chunks(
+        key, render_shopping_list(user, file_type, detailed)
+    )
@@ -0,0 +1,149 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens
+from api.cache import (
+    CART_VERSION,
+    USER_VERSION,
+    bump_versions,
+    invalidate_recipes,
+)
+from api.pantry import changed_on_commit as pantry_changed_on_commit
+from food.images import image_variants_ready
+from food.models import (
+    Favorite,
+    Ingredients,
+    IngredientsRecipe,
+    Recipes,
+    ShoppingCart,
+    Subscriptions,
+    Tag,
+    User,
+)
+from food.shopping_lists import (
+    get_recipe_cart_user_ids,
+    shopping_lists_changed,
+)
+
+
+def invalidate_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: invalidate_recipes(recipe_ids))
+
+
+def bump_on_commit(*names):
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+def bump_carts_on_commit(user_ids):
+    if user_ids:
+        bump_on_commit(*(CART_VERSION.format(user_id) for user_id in user_ids))
+
+
+def invalidate_tokens_on_commit(keys):
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_on_commit((instance.id,))
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_updated(sender, instance, created, **kwargs):
+    if not created:
+        bump_carts_on_commit(get_recipe_cart_user_ids(instance.id))
+
+
+@receiver(image_variants_ready)
+def recipe_image_variants_ready(sender, recipe_id, **kwargs):
+    invalidate_on_commit((recipe_id,))
+
+
+@receiver(shopping_lists_changed)
+def shopping_lists_refreshed(sender, user_ids, **kwargs):
+    bump_carts_on_commit(user_ids)
+
+
+@receiver(post_save, sender=IngredientsRecipe)
+@receiver(post_delete, sender=IngredientsRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_on_commit((instance.recipe_id,))
+    pantry_changed_on_commit((instance.recipe_id,))
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            invalidate_on_commit((instance.id,))
+    elif action == "pre_clear":
+        invalidate_on_commit(
+            Recipes.objects.filter(tags=instance).values_list("id", flat=True)
+        )
+    elif action.startswith("post_") and pk_set:
+        invalidate_on_commit(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_on_commit("tags")
+    invalidate_on_commit(
+        Recipes.objects.filter(tags=instance).values_list("id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def ingredient_changed(sender, instance, **kwargs):
+    bump_on_commit("ingredients")
+    invalidate_on_commit(
+        instance.in_recipe.values_list("recipe_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields, **kwargs):
+    if update_fields and set(update_fields) <= {"last_login", "password"}:
+        return
+    invalidate_on_commit(instance.recipes.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_credentials_changed(sender, instance, **kwargs):
+    if kwargs.get("update_fields") == frozenset(("last_login",)):
+        return
+    invalidate_tokens_on_commit(
+        Token.objects.filter(user_id=instance.id).values_list(
+            "key", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens_on_commit((instance.key,))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscriptions)
+@receiver(post_delete, sender=Subscriptions)
+def user_lists_changed(sender, instance, **kwargs):
+    bump_on_commit(USER_VERSION.format(instance.user_id))
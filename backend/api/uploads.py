@@ -0,0 +1,60 @@
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from backend.settings import MAX_IMAGE_SIDE, MAX_IMAGE_SIZE
+
+IMAGE_TOO_LARGE_MESSAGE = (
+    f"Размер изображения не должен превышать {MAX_IMAGE_SIZE // 2 ** 20} МБ"
+)
+IMAGE_DIMENSIONS_MESSAGE = (
+    f"Стороны изображения не должны превышать {MAX_IMAGE_SIDE} px"
+)
+
+
+class FileTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = IMAGE_TOO_LARGE_MESSAGE
+    default_code = "file_too_large"
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемый файл во временный файл и прерывает
+    приём, как только размер превысил MAX_IMAGE_SIZE.
+
+    Превышение отмечается в request.upload_too_large, ответ 413
+    формирует view (LimitedUploadMixin).
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > MAX_IMAGE_SIZE:
+            self.file.close()
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def validate_image_file(file):
+    """Проверяет размер файла и стороны изображения по заголовку,
+    не декодируя само изображение."""
+    if file.size > MAX_IMAGE_SIZE:
+        raise serializers.ValidationError(IMAGE_TOO_LARGE_MESSAGE)
+    try:
+        width, height = Image.open(file).size
+    except Exception:
+        # Некорректный файл отклонит проверка ImageField.
+        return
+    finally:
+        file.seek(0)
+    if width > MAX_IMAGE_SIDE or height > MAX_IMAGE_SIDE:
+        raise serializers.ValidationError(IMAGE_DIMENSIONS_MESSAGE)
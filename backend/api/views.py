@@ -1,6 +1,16 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
 
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -14,23 +24,41 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 
+from api.autocomplete import ingredients_index
+from api.catalog import ingredients_catalog
 from api.filters import RecipesFilter
-from api.pagination import LimitPageNumberPagination
+from api.mixins import ConditionalGetMixin, LimitedUploadMixin
+from api.pagination import (
+    FeedPagination,
+    LimitPageNumberPagination,
+    PantryPagination,
+)
+from api.pantry import pantry_index
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (
     FavoriteSerializer,
     IngredientsRecipeSerializer,
     IngredientsSerializer,
+    PantrySerializer,
     RecipesCreateSerializer,
+    RecipesLimitSerializer,
     RecipesSerializer,
     ShoppingCartSerializer,
     SubscriptionsListSerializer,
     SubscriptionsSerializer,
     TagSerializer,
 )
-from backend.settings import TEXT_FILE_NAME
+from api.shopping_list import FORMATS as SHOPPING_LIST_FORMATS
+from api.shopping_list import (
+    get_download,
+    get_download_etag,
+    get_download_key,
+    get_shopping_list,
+)
+from backend.settings import INGREDIENTS_SEARCH_LIMIT, SHOPPING_LIST_FILE_NAME
 from food.models import (
     Favorite,
+    FeedItem,
     Ingredients,
     IngredientsRecipe,
     Recipes,
@@ -40,29 +68,71 @@ from food.models import (
     User,
 )
 
-CONTENT_TYPE_TEXT = "text/plain; charset=UTF-8"
-
 
 class UserViewSet(UserViewSet):
     queryset = User.objects.all()
     pagination_class = LimitPageNumberPagination
+    cursor_ordering = ("id",)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_subscribed=Exists(
+                Subscriptions.objects.filter(user=user, author=OuterRef("pk"))
+            )
+        )
 
     @action(
         detail=False, methods=("GET",), permission_classes=(IsAuthenticated,)
     )
     def me(self, request):
-        user = request.user
-        serializer = self.get_serializer(user)
+        serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(
+    ConditionalGetMixin, LimitedUploadMixin, viewsets.ModelViewSet
+):
     queryset = Recipes.objects.all()
     serializer_class = RecipesSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilter
     pagination_class = LimitPageNumberPagination
+    cursor_ordering = ("-pub_date", "-id")
+    etag_versions = ("recipes",)
+    user_dependent = True
+
+    def get_queryset(self):
+        # Поисковый вектор нужен только в условиях и ранжировании.
+        queryset = self.queryset.select_related("author").defer(
+            "search_vector"
+        )
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            author_is_subscribed=Exists(
+                Subscriptions.objects.filter(
+                    user=user, author=OuterRef("author")
+                )
+            ),
+        )
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -73,35 +143,148 @@ class RecipesViewSet(viewsets.ModelViewSet):
         detail=False, methods=("GET",), permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        shop_cart = IngredientsRecipe.objects.filter(
-            recipe__shopping_cart__user=self.request.user.id
-        )
-        shop_cart_sum = shop_cart.values("ingredient").annotate(
-            sum_ing=Sum("amount")
-        )
-        response = HttpResponse(content_type=CONTENT_TYPE_TEXT)
-        response[
-            "Content-Disposition"
-        ] = f"attachment; filename={TEXT_FILE_NAME}"
-
-        ing_list = []
-
-        for ing, sum_ing in shop_cart_sum.values_list("ingredient", "sum_ing"):
-            ingr = get_object_or_404(Ingredients, id=ing)
-            ing_list.append(
-                f"{ingr.name} ({ingr.measurement_unit}) - {sum_ing}\n"
+        file_type = request.query_params.get("type", "txt")
+        if file_type not in SHOPPING_LIST_FORMATS:
+            return Response(
+                "Допустимые форматы: "
+                + ", ".join(SHOPPING_LIST_FORMATS),
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        detailed = request.query_params.get("detailed") == "1"
+        key = get_download_key(request.user, file_type, detailed)
+        etag = get_download_etag(key)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content_type, _ = SHOPPING_LIST_FORMATS[file_type]
+            response = StreamingHttpResponse(
+                get_download(request.user, file_type, detailed, key),
+                content_type=content_type,
             )
-        response.writelines(ing_list)
+            response["Content-Disposition"] = (
+                f"attachment; filename={SHOPPING_LIST_FILE_NAME}.{file_type}"
+            )
+        response["ETag"] = etag
         return response
 
+    @action(
+        detail=False, methods=("GET",), permission_classes=(IsAuthenticated,)
+    )
+    def shopping_list(self, request):
+        return Response(get_shopping_list(request.user))
+
+    @action(
+        detail=False, methods=("GET",), permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        paginator = FeedPagination()
+        items = paginator.paginate_queryset(
+            FeedItem.objects.filter(user=request.user).only(
+                "id", "pub_date", "recipe_id"
+            ),
+            request,
+        )
+        recipes = self.get_queryset().in_bulk(
+            [item.recipe_id for item in items]
+        )
+        serializer = self.get_serializer(
+            [
+                recipes[item.recipe_id]
+                for item in items
+                if item.recipe_id in recipes
+            ],
+            many=True,
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=("GET",))
+    def pantry(self, request):
+        """Рецепты по имеющимся продуктам: ingredients — id ингредиентов
+        через запятую, missing — сколько ингредиентов может не хватать."""
+        return self.conditional_response(request, self.get_pantry)
+
+    def get_pantry(self, request):
+        params = {
+            "ingredients": [
+                value.strip()
+                for values in request.query_params.getlist("ingredients")
+                for value in values.split(",")
+                if value.strip()
+            ]
+        }
+        if "missing" in request.query_params:
+            params["missing"] = request.query_params["missing"]
+        serializer = PantrySerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        found = pantry_index.search(
+            serializer.validated_data["ingredients"],
+            serializer.validated_data.get("missing"),
+        )
+        paginator = PantryPagination()
+        page = paginator.paginate_queryset(found, request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        page = [item for item in page if item[0] in recipes]
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _, _ in page], many=True
+        )
+        return paginator.get_paginated_response(
+            [
+                {
+                    **data,
+                    "coverage": round(count / total, 4),
+                    "missing": total - count,
+                }
+                for data, (_, count, total) in zip(serializer.data, page)
+            ]
+        )
+
 
 class SubscriptionsListView(ListAPIView):
     serializer_class = SubscriptionsListSerializer
     pagination_class = LimitPageNumberPagination
+    cursor_ordering = ("id",)
+
+    @cached_property
+    def recipes_limit(self):
+        serializer = RecipesLimitSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get("recipes_limit")
+
+    def get_recipes_queryset(self):
+        """Последние recipes_limit рецептов каждого автора страницы
+        одним запросом: коррелированный подзапрос с LIMIT отбирает
+        id рецептов по индексу (author, -pub_date)."""
+        limit = self.recipes_limit
+        if limit == 0:
+            return Recipes.objects.none()
+        queryset = Recipes.objects.defer("search_vector").order_by(
+            "-pub_date", "-id"
+        )
+        if limit is None:
+            return queryset
+        return queryset.filter(
+            id__in=Subquery(
+                Recipes.objects.filter(author_id=OuterRef("author_id"))
+                .order_by("-pub_date", "-id")
+                .values("id")[:limit]
+            )
+        )
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(following__user=user)
+        return (
+            User.objects.filter(following__user=user)
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .prefetch_related(
+                Prefetch(
+                    "recipes",
+                    queryset=self.get_recipes_queryset(),
+                    to_attr="limited_recipes",
+                )
+            )
+        )
 
 
 class SubscriptionsView(generics.CreateAPIView, generics.DestroyAPIView):
@@ -127,12 +310,32 @@ class SubscriptionsView(generics.CreateAPIView, generics.DestroyAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     filter_backends = (filters.SearchFilter,)
     search_fields = ("^name",)
     permission_classes = (AllowAny,)
+    pagination_class = LimitPageNumberPagination
+    cursor_ordering = ("name", "id")
+    etag_versions = ("ingredients",)
+
+    def list(self, request, *args, **kwargs):
+        search_param = filters.SearchFilter.search_param
+        query = request.query_params.get(search_param, "").strip()
+        if not query:
+            if (
+                request.accepted_renderer.format == "json"
+                and not request.query_params
+            ):
+                return ingredients_catalog.response(request)
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params["limit"])
+        except (KeyError, ValueError):
+            limit = INGREDIENTS_SEARCH_LIMIT
+        limit = min(max(limit, 1), INGREDIENTS_SEARCH_LIMIT)
+        return Response(ingredients_index.search(query, limit))
 
 
 class IngredientsRecipeViewSet(viewsets.ModelViewSet):
@@ -141,10 +344,11 @@ class IngredientsRecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    etag_versions = ("tags",)
 
 
 class FavoriteView(generics.CreateAPIView, generics.DestroyAPIView):
@@ -174,11 +378,13 @@ class ShoppingCartView(generics.CreateAPIView, generics.DestroyAPIView):
     queryset = ShoppingCart.objects.all()
     serializer_class = ShoppingCartSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             recipe_id=self.kwargs["id"], user_id=self.request.user.id
         )
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         recipe_id = self.kwargs["id"]
         recipe = get_object_or_404(Recipes, id=recipe_id)
@@ -18,7 +18,8 @@ env = environ.Env()
 environ.Env.read_env()
 
 
-TEXT_FILE_NAME = "shopping-cart.txt"
+SHOPPING_LIST_FILE_NAME = "shopping-cart"
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
 
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -39,6 +40,36 @@ MIN_TIME = 1
 MIN_AMOUNT = 1
 MIN_TAG_NUMBER = 1
 
+CURSOR_PAGE_SIZE = 6
+
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24
+
+INGREDIENTS_INDEX_TTL = 60 * 5
+INGREDIENTS_SEARCH_LIMIT = 20
+
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_SIDE = 8192
+
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+IMAGE_WEBP_QUALITY = 80
+IMAGE_WORKERS = 2
+IMAGE_RELEASE_GRACE = 60 * 60
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_LOCAL_TTL = 30
+AUTH_TOKEN_CACHE_TTL = 60 * 5
+
+FEED_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+FEED_WORKERS = 2
+
+SEARCH_CONFIG = "russian"
+
+PANTRY_INDEX_TTL = 60 * 60
+PANTRY_LOG_LIMIT = 1000
+PANTRY_LOG_TIMEOUT = 60 * 60 * 24
+PANTRY_MAX_INGREDIENTS = 100
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -107,6 +138,14 @@ DATABASES = {
     }
 }
 
+# Cache
+# Для нескольких процессов gunicorn нужен общий кэш, например
+# CACHE_URL=redis://host:6379/1 или memcache://host:11211
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -151,13 +190,16 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = "/mediafiles/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Файлы именуются по хэшу содержимого, одинаковые загрузки не дублируются.
+DEFAULT_FILE_STORAGE = "food.storage.ContentAddressedStorage"
+
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ),
     "SEARCH_PARAM": "name",
 }
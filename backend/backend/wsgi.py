@@ -10,7 +10,17 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_wsgi_application()
+
+try:
+    from api.autocomplete import ingredients_index
+    from api.pantry import pantry_index
+
+    ingredients_index.refresh()
+    pantry_index.refresh()
+except DatabaseError:
+    pass
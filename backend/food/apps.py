@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class FoodConfig(AppConfig):
     name = "food"
+
+    def ready(self):
+        import food.feeds  # noqa: F401
+        import food.images  # noqa: F401
+        import food.search  # noqa: F401
+        import food.signals  # noqa: F401
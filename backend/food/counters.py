@@ -0,0 +1,32 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    """Количество записей model, ссылающихся через field на текущую строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile_counter(model, counter, related_model, field, dry_run=False):
+    """Исправляет счетчик одним UPDATE, возвращает число исправленных строк."""
+    actual = count_subquery(related_model, field)
+    drifted = (
+        model.objects.annotate(actual=actual)
+        .exclude(**{counter: F("actual")})
+        .values_list("pk", flat=True)
+    )
+    if dry_run:
+        return drifted.count()
+    return model.objects.filter(pk__in=drifted).update(
+        **{counter: count_subquery(related_model, field)}
+    )
@@ -0,0 +1,96 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.settings import (
+    FEED_BACKFILL_SIZE,
+    FEED_BATCH_SIZE,
+    FEED_WORKERS,
+)
+from food.models import FeedItem, Recipes, Subscriptions
+from food.tasks import BackgroundPool
+
+pool = BackgroundPool("feeds", FEED_WORKERS)
+
+
+def fan_out(recipe_id):
+    """Добавляет рецепт в ленты всех подписчиков автора пачками."""
+    recipe = (
+        Recipes.objects.filter(id=recipe_id)
+        .values("author_id", "pub_date")
+        .first()
+    )
+    if recipe is None:
+        return
+    followers = (
+        Subscriptions.objects.filter(author_id=recipe["author_id"])
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+    )
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            followers.filter(user_id__gt=last_user_id)[:FEED_BATCH_SIZE]
+        )
+        if not user_ids:
+            return
+        FeedItem.objects.bulk_create(
+            (
+                FeedItem(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    pub_date=recipe["pub_date"],
+                )
+                for user_id in user_ids
+            ),
+            ignore_conflicts=True,
+        )
+        last_user_id = user_ids[-1]
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними рецептами нового автора."""
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in Recipes.objects.filter(
+                author_id=author_id
+            )
+            .order_by("-pub_date", "-id")
+            .values_list("id", "pub_date")[:FEED_BACKFILL_SIZE]
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(pool.submit, fan_out, instance.id))
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            partial(
+                pool.submit, backfill, instance.user_id, instance.author_id
+            )
+        )
+
+
+@receiver(post_delete, sender=Subscriptions)
+def subscription_deleted(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(
+            pool.submit, remove_author, instance.user_id, instance.author_id
+        )
+    )
@@ -0,0 +1,197 @@
+import io
+import os
+import re
+from datetime import timedelta
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from PIL import Image, ImageOps
+
+from backend.settings import (
+    IMAGE_RELEASE_GRACE,
+    IMAGE_WEBP_QUALITY,
+    IMAGE_WORKERS,
+    RECIPE_IMAGE_WIDTHS,
+)
+from food.models import Recipes
+from food.tasks import BackgroundPool
+
+# Копии лежат в отдельном каталоге рядом с оригиналами, чтобы их имена
+# не совпадали с именами загруженных файлов.
+VARIANTS_DIR = "variants"
+VARIANT_NAME = "{}_{}w{}"
+VARIANT_PATTERN = r"_\d+w\.\w+$"
+WEBP_EXT = ".webp"
+
+# Отправляется, когда копии картинки рецепта готовы, аргумент recipe_id.
+image_variants_ready = Signal()
+
+pool = BackgroundPool("image-variants", IMAGE_WORKERS)
+
+
+def get_widths(width):
+    """Ширины уменьшенных копий картинки исходной ширины width."""
+    return [size for size in RECIPE_IMAGE_WIDTHS if size < width]
+
+
+def variant_name(name, width, ext=None):
+    root, original_ext = os.path.splitext(name)
+    return "/".join(
+        (VARIANTS_DIR, VARIANT_NAME.format(root, width, ext or original_ext))
+    )
+
+
+def get_storage():
+    return Recipes._meta.get_field("image").storage
+
+
+def get_variants(recipe):
+    """Пары (имя файла, ширина) для srcset картинки рецепта.
+
+    Возвращает None, пока уменьшенные копии текущей картинки не готовы.
+    """
+    name = recipe.image.name
+    if not name or recipe.image_variants != name:
+        return None
+    widths = get_widths(recipe.image_width)
+    return {
+        "image": [
+            (variant_name(name, width), width) for width in widths
+        ] + [(name, recipe.image_width)],
+        "webp": [
+            (variant_name(name, width, WEBP_EXT), width)
+            for width in widths + [recipe.image_width]
+        ],
+    }
+
+
+def save_image(storage, name, image, format, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format, **params)
+    if storage.exists(name):
+        storage.delete(name)
+    save = getattr(storage, "save_exact", storage.save)
+    save(name, ContentFile(buffer.getvalue()))
+
+
+def build_variants(recipe_id, name):
+    """Создает уменьшенные копии и WebP-варианты картинки рецепта
+    рядом с оригиналом."""
+    recipes = Recipes.objects.filter(id=recipe_id, image=name)
+    if not recipes.exclude(image_variants=name).exists():
+        return
+    storage = get_storage()
+    with storage.open(name) as file:
+        source = Image.open(file)
+        format = source.format
+        image = ImageOps.exif_transpose(source)
+        image = image.convert(
+            "RGBA" if "A" in image.getbands()
+            or "transparency" in image.info else "RGB"
+        )
+    width, height = image.size
+    for size in get_widths(width) + [width]:
+        resized = image
+        if size < width:
+            resized = image.resize(
+                (size, max(1, round(height * size / width)))
+            )
+        save_image(
+            storage,
+            variant_name(name, size, WEBP_EXT),
+            resized,
+            "WEBP",
+            quality=IMAGE_WEBP_QUALITY,
+        )
+        if size < width:
+            if format == "JPEG":
+                resized = resized.convert("RGB")
+            save_image(
+                storage, variant_name(name, size), resized, format
+            )
+    if recipes.update(image_width=width, image_variants=name):
+        image_variants_ready.send(sender=Recipes, recipe_id=recipe_id)
+
+
+def schedule_variants(recipe_id, name):
+    """Ставит обработку картинки в очередь пула фоновых потоков."""
+    return pool.submit(build_variants, recipe_id, name)
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_image_saved(sender, instance, **kwargs):
+    name = instance.image.name
+    if name and name != instance.image_variants:
+        transaction.on_commit(partial(schedule_variants, instance.id, name))
+
+
+def delete_image(name):
+    """Удаляет картинку вместе с её копиями."""
+    storage = get_storage()
+    directory, prefix = os.path.split(
+        "/".join((VARIANTS_DIR, os.path.splitext(name)[0]))
+    )
+    if storage.exists(directory):
+        pattern = re.compile(re.escape(prefix) + VARIANT_PATTERN)
+        for file in storage.listdir(directory)[1]:
+            if pattern.match(file):
+                storage.delete("/".join((directory, file)))
+    storage.delete(name)
+
+
+def release_images(names):
+    """Удаляет картинки, на которые больше не ссылается ни один рецепт.
+
+    Одинаковые картинки хранятся один раз, поэтому число ссылок на файл
+    равно числу рецептов с этим именем картинки. Файлы, записанные или
+    переиспользованные за последние IMAGE_RELEASE_GRACE секунд, могли
+    достаться рецепту, который еще не сохранен: их не трогаем и
+    оставляем команде collect_orphaned_media.
+    """
+    names = set(filter(None, names))
+    used = set(
+        Recipes.objects.filter(image__in=names).values_list(
+            "image", flat=True
+        )
+    )
+    storage = get_storage()
+    modified_before = timezone.now() - timedelta(seconds=IMAGE_RELEASE_GRACE)
+    for name in names - used:
+        if (
+            storage.exists(name)
+            and storage.get_modified_time(name) > modified_before
+        ):
+            continue
+        delete_image(name)
+
+
+@receiver(pre_save, sender=Recipes)
+def recipe_image_saving(sender, instance, update_fields, **kwargs):
+    if instance._state.adding or (
+        update_fields is not None and "image" not in update_fields
+    ):
+        return
+    instance.previous_image = (
+        Recipes.objects.filter(id=instance.id)
+        .values_list("image", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_image_replaced(sender, instance, **kwargs):
+    previous = instance.__dict__.pop("previous_image", None)
+    if previous and previous != instance.image.name:
+        transaction.on_commit(partial(release_images, (previous,)))
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_image_deleted(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(release_images, (instance.image.name,))
+    )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from food.images import build_variants
+from food.models import Recipes
+
+
+class Command(BaseCommand):
+    help = "Создает уменьшенные копии и WebP-варианты картинок рецептов."
+
+    def handle(self, *args, **options):
+        recipes = (
+            Recipes.objects.exclude(image="")
+            .exclude(image_variants=F("image"))
+            .values_list("id", "image")
+        )
+        count = 0
+        for recipe_id, name in recipes.iterator():
+            build_variants(recipe_id, name)
+            count += 1
+        self.stdout.write(f"Обработано картинок: {count}")
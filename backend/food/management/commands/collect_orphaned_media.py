@@ -0,0 +1,138 @@
+import os
+import re
+import shutil
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from food.images import VARIANT_PATTERN, VARIANTS_DIR, get_storage
+from food.models import Recipes
+
+BATCH_SIZE = 100
+PAUSE = 1.0
+MIN_AGE = 60
+
+
+def walk(storage, directory=""):
+    """Обходит каталог хранилища, держа в памяти по одному каталогу."""
+    directories, files = storage.listdir(directory)
+    prefix = f"{directory}/" if directory else ""
+    for name in files:
+        yield prefix + name
+    for name in directories:
+        yield from walk(storage, prefix + name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из MEDIA_ROOT картинки и их копии, на которые не "
+        "ссылается ни один рецепт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать файлы, которые будут удалены.",
+        )
+        parser.add_argument(
+            "--quarantine",
+            help="Переместить файлы в указанный каталог вместо удаления.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Количество файлов, обрабатываемых за один раз.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=PAUSE,
+            help="Пауза между пачками в секундах.",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=MIN_AGE,
+            help=(
+                "Не трогать файлы моложе указанного числа минут: "
+                "их рецепты могут быть еще не сохранены."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        storage = get_storage()
+        names = set(
+            Recipes.objects.values_list("image", flat=True).iterator()
+        )
+        roots = {os.path.splitext(name)[0] for name in names}
+        variant = re.compile(VARIANT_PATTERN)
+        quarantine = options["quarantine"]
+        if quarantine:
+            quarantine = os.path.abspath(quarantine)
+        created_before = timezone.now() - timedelta(
+            minutes=options["min_age"]
+        )
+        batch, found = [], 0
+        for name in walk(storage):
+            if name.startswith(f"{VARIANTS_DIR}/"):
+                root = name[len(VARIANTS_DIR) + 1:]
+                if variant.search(root) and (
+                    variant.sub("", root) in roots
+                ):
+                    continue
+            elif name in names:
+                continue
+            if quarantine and storage.path(name).startswith(quarantine):
+                continue
+            if storage.get_modified_time(name) > created_before:
+                continue
+            batch.append(name)
+            if len(batch) >= options["batch_size"]:
+                found += self.process(storage, batch, options)
+                batch = []
+                time.sleep(options["pause"])
+        found += self.process(storage, batch, options)
+        action = "Найдено" if options["dry_run"] else "Обработано"
+        self.stdout.write(f"{action} неиспользуемых файлов: {found}")
+
+    def get_referenced(self, names):
+        """Файлы пачки, на которые ссылаются рецепты сейчас: рецепт,
+        сохраненный после начала обхода, мог переиспользовать старый
+        файл с тем же содержимым."""
+        variant = re.compile(VARIANT_PATTERN)
+        condition = Q(image__in=names)
+        variants = {}
+        for name in names:
+            if name.startswith(f"{VARIANTS_DIR}/"):
+                root = variant.sub("", name[len(VARIANTS_DIR) + 1:])
+                variants.setdefault(root, []).append(name)
+                condition |= Q(image__startswith=f"{root}.")
+        referenced = set()
+        for image in Recipes.objects.filter(condition).values_list(
+            "image", flat=True
+        ):
+            referenced.add(image)
+            referenced.update(variants.get(os.path.splitext(image)[0], ()))
+        return referenced
+
+    def process(self, storage, names, options):
+        """Обрабатывает пачку и возвращает число обработанных файлов."""
+        if not names:
+            return 0
+        referenced = self.get_referenced(names)
+        names = [name for name in names if name not in referenced]
+        for name in names:
+            if options["dry_run"]:
+                self.stdout.write(name)
+            elif options["quarantine"]:
+                target = os.path.join(options["quarantine"], name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(storage.path(name), target)
+            else:
+                storage.delete(name)
+        return len(names)
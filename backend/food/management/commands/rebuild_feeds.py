@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from food.feeds import backfill
+from food.models import Subscriptions
+
+
+class Command(BaseCommand):
+    help = (
+        "Дополняет ленты подписок последними рецептами авторов. "
+        "Восстанавливает записи, потерянные при фоновой рассылке."
+    )
+
+    def handle(self, *args, **options):
+        count = 0
+        for user_id, author_id in Subscriptions.objects.values_list(
+            "user_id", "author_id"
+        ).iterator():
+            backfill(user_id, author_id)
+            count += 1
+        self.stdout.write(f"Обработано подписок: {count}")
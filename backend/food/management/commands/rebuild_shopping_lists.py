@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from food.models import ShoppingCart, ShoppingListItem
+from food.shopping_lists import refresh_shopping_lists
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает материализованные списки покупок пользователей."
+
+    def handle(self, *args, **options):
+        user_ids = sorted(
+            set(ShoppingCart.objects.values_list("user_id", flat=True))
+            | set(ShoppingListItem.objects.values_list("user_id", flat=True))
+        )
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            refresh_shopping_lists(user_ids[start:start + BATCH_SIZE])
+        self.stdout.write(f"Пересчитано списков покупок: {len(user_ids)}")
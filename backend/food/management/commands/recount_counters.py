@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from food.counters import reconcile_counter
+from food.models import Favorite, Recipes, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики favorites_count у рецептов "
+        "и recipes_count у пользователей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать количество расхождений.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        recipes = reconcile_counter(
+            Recipes, "favorites_count", Favorite, "recipe", dry_run
+        )
+        users = reconcile_counter(
+            User, "recipes_count", Recipes, "author", dry_run
+        )
+        action = "Найдено расхождений" if dry_run else "Исправлено"
+        self.stdout.write(
+            f"{action}: рецептов - {recipes}, пользователей - {users}"
+        )
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+from food.counters import reconcile_counter
+
+
+def fill_counters(apps, schema_editor):
+    Favorite = apps.get_model("food", "Favorite")
+    Recipes = apps.get_model("food", "Recipes")
+    User = apps.get_model("food", "User")
+    reconcile_counter(Recipes, "favorites_count", Favorite, "recipe")
+    reconcile_counter(User, "recipes_count", Recipes, "author")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0012_auto_20221130_1633'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
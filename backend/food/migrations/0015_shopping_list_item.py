@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    IngredientsRecipe = apps.get_model("food", "IngredientsRecipe")
+    ShoppingListItem = apps.get_model("food", "ShoppingListItem")
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row["user_id"],
+            ingredient_id=row["ingredient_id"],
+            amount=row["total"],
+        )
+        for row in IngredientsRecipe.objects.filter(
+            recipe__shopping_cart__isnull=False
+        )
+        .values(
+            "ingredient_id",
+            user_id=models.F("recipe__shopping_cart__user_id"),
+        )
+        .annotate(total=models.Sum("amount"))
+        .order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0014_recipe_author_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(help_text='Суммарное количество по рецептам из списка покупок', verbose_name='Кол-во')),
+                ('ingredient', models.ForeignKey(help_text='Укажите ингредиент', on_delete=django.db.models.deletion.CASCADE, related_name='in_shopping_lists', to='food.Ingredients', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(help_text='Укажите пользователя', on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списке покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient_shopping_list'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
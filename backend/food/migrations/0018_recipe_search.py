@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:32
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INGREDIENT_NAMES = (
+    "SELECT string_agg(i.name, ' ') FROM food_ingredientsrecipe ir "
+    "JOIN food_ingredients i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = food_recipes.id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX recipe_search_vector_idx ON food_recipes "
+            "USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE food_recipes SET search_vector = "
+            "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', "
+            f"coalesce(({INGREDIENT_NAMES}), '')), 'B') || "
+            "setweight(to_tsvector('russian', coalesce(text, '')), 'C')"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE food_recipes_fts USING fts5("
+            "name, ingredients, text, tokenize = 'unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO food_recipes_fts (rowid, name, ingredients, text) "
+            "SELECT id, name, coalesce(("
+            + INGREDIENT_NAMES.replace("string_agg", "group_concat")
+            + "), ''), text FROM food_recipes"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX recipe_search_vector_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE food_recipes_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0017_feed_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
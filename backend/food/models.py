@@ -1,11 +1,34 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
 from backend.settings import MIN_TIME, MIN_AMOUNT
 
 
-class User(AbstractUser):
+class ManagedFieldsMixin:
+    """Не перезаписывает служебные поля при сохранении существующей записи.
+
+    Поля из managed_fields заполняются отдельными UPDATE: счетчики из
+    food.signals, данные картинки из food.images, поисковый вектор из
+    food.search. Обычный save() не должен возвращать в БД их устаревшие
+    значения.
+    """
+
+    managed_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.managed_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(ManagedFieldsMixin, AbstractUser):
 
     username = models.CharField(
         max_length=150,
@@ -36,9 +59,15 @@ class User(AbstractUser):
         verbose_name="Пароль",
         help_text="Укажите пароль",
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество рецептов",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ("username", "first_name", "last_name")
+    managed_fields = ("recipes_count",)
 
     class Meta:
         ordering = ("id",)
@@ -88,7 +117,7 @@ class Ingredients(models.Model):
         return self.name
 
 
-class Recipes(models.Model):
+class Recipes(ManagedFieldsMixin, models.Model):
     tags = models.ManyToManyField(
         Tag, verbose_name="Теги", help_text="Укажите теги",
         blank=False)
@@ -140,6 +169,39 @@ class Recipes(models.Model):
         help_text="Укажите время готовки",
         blank=False
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name="Количество добавлений в избранное",
+    )
+
+    image_width = models.PositiveIntegerField(
+        null=True,
+        editable=False,
+        verbose_name="Ширина картинки",
+    )
+    image_variants = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name="Картинка, для которой созданы уменьшенные копии",
+    )
+
+    # GIN-индекс по полю создается миграцией только в PostgreSQL,
+    # в SQLite вместо него используется таблица FTS5 (см. food.search).
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Поисковый вектор",
+    )
+
+    managed_fields = (
+        "favorites_count",
+        "image_width",
+        "image_variants",
+        "search_vector",
+    )
 
     class Meta:
         constraints = (
@@ -148,6 +210,12 @@ class Recipes(models.Model):
                 name="author_recipe_name_unique",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("author", "-pub_date"),
+                name="recipe_author_pub_date_idx",
+            ),
+        )
         ordering = ("-pub_date",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
@@ -233,6 +301,40 @@ class ShoppingCart(models.Model):
         return self.recipe.name
 
 
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+        help_text="Укажите пользователя",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        related_name="in_shopping_lists",
+        help_text="Укажите ингредиент",
+        verbose_name="Ингредиент",
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name="Кол-во",
+        help_text="Суммарное количество по рецептам из списка покупок",
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_user_ingredient_shopping_list",
+            ),
+        )
+        verbose_name = "Ингредиент в списке покупок"
+        verbose_name_plural = "Ингредиенты в списке покупок"
+
+    def __str__(self):
+        return self.ingredient.name
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -290,3 +392,43 @@ class Subscriptions(models.Model):
 
     def __str__(self):
         return self.author.username
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed",
+        help_text="Укажите подписчика",
+        verbose_name="Подписчик",
+    )
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="in_feeds",
+        help_text="Укажите рецепт",
+        verbose_name="Рецепт",
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации",
+        help_text="Дата публикации рецепта",
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "recipe"),
+                name="unique_user_recipe_feed",
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-pub_date", "-id"),
+                name="feed_user_pub_date_idx",
+            ),
+        )
+        verbose_name = "Рецепт в ленте подписок"
+        verbose_name_plural = "Лента подписок"
+
+    def __str__(self):
+        return self.recipe.name
@@ -0,0 +1,160 @@
+from functools import partial
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection, transaction
+from django.db.models import BooleanField, F, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from backend.settings import SEARCH_CONFIG
+from food.models import Ingredients, IngredientsRecipe, Recipes
+
+# Таблица FTS5 для SQLite, rowid совпадает с id рецепта.
+FTS_TABLE = "food_recipes_fts"
+# Веса столбцов name, ingredients и text для bm25.
+FTS_WEIGHTS = "10.0, 5.0, 1.0"
+# SQLite ограничивает число параметров запроса.
+SQLITE_BATCH_SIZE = 500
+
+
+def is_postgresql():
+    return connection.vendor == "postgresql"
+
+
+def get_search_vector():
+    """Название важнее списка ингредиентов, а он важнее описания."""
+    ingredients = (
+        IngredientsRecipe.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", " "))
+        .values("names")
+    )
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(ingredients), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("text", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def delete_from_sqlite_index(recipe_ids):
+    placeholders = ", ".join(["%s"] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+            recipe_ids,
+        )
+
+
+def update_sqlite_index(recipe_ids):
+    recipes = Recipes._meta.db_table
+    placeholders = ", ".join(["%s"] * len(recipe_ids))
+    delete_from_sqlite_index(recipe_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) "
+            f"SELECT r.id, r.name, COALESCE(("
+            f"SELECT group_concat(i.name, ' ') "
+            f"FROM {IngredientsRecipe._meta.db_table} ir "
+            f"JOIN {Ingredients._meta.db_table} i "
+            f"ON i.id = ir.ingredient_id WHERE ir.recipe_id = r.id"
+            f"), ''), r.text FROM {recipes} r "
+            f"WHERE r.id IN ({placeholders})",
+            recipe_ids,
+        )
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковый индекс рецептов: столбец search_vector
+    в PostgreSQL или таблицу FTS5 в SQLite."""
+    recipe_ids = sorted(set(recipe_ids))
+    if not recipe_ids:
+        return
+    if is_postgresql():
+        Recipes.objects.filter(id__in=recipe_ids).update(
+            search_vector=get_search_vector()
+        )
+        return
+    for start in range(0, len(recipe_ids), SQLITE_BATCH_SIZE):
+        update_sqlite_index(recipe_ids[start:start + SQLITE_BATCH_SIZE])
+
+
+def fts_query(value):
+    """Запрос FTS5 из слов пользователя: каждое слово в кавычках,
+    чтобы спецсимволы синтаксиса MATCH не разбирались."""
+    return " ".join(
+        '"{}"'.format(word.replace('"', '""')) for word in value.split()
+    )
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, от наиболее релевантных."""
+    if not value.split():
+        return queryset
+    if is_postgresql():
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+    else:
+        match = fts_query(value)
+        recipes = Recipes._meta.db_table
+        # Условие IN записано целиком: SQLite разбирает "id IN ((...))"
+        # как список из одного значения.
+        queryset = queryset.annotate(
+            search_match=RawSQL(
+                f"{recipes}.id IN (SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s)",
+                (match,),
+                output_field=BooleanField(),
+            )
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}, {FTS_WEIGHTS}) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"AND rowid = {recipes}.id",
+                (match,),
+            )
+        )
+    return queryset.order_by("-search_rank", "-pub_date", "-id")
+
+
+def update_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(partial(update_search_index, recipe_ids))
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_saved(sender, instance, **kwargs):
+    # Ингредиенты записываются после рецепта, поэтому индекс
+    # пересчитывается после завершения транзакции.
+    update_on_commit((instance.id,))
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_deleted(sender, instance, **kwargs):
+    # Строки Recipes в PostgreSQL удаляются вместе с вектором.
+    if not is_postgresql():
+        transaction.on_commit(
+            partial(delete_from_sqlite_index, [instance.id])
+        )
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_on_commit(
+            instance.in_recipe.values_list("recipe_id", flat=True)
+        )
+
+
+@receiver(pre_delete, sender=Ingredients)
+def ingredient_deleted(sender, instance, **kwargs):
+    update_on_commit(instance.in_recipe.values_list("recipe_id", flat=True))
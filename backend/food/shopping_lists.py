@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from django.dispatch import Signal
+
+from food.models import (
+    IngredientsRecipe,
+    ShoppingCart,
+    ShoppingListItem,
+    User,
+)
+
+# Отправляется после пересчета списков покупок, аргумент user_ids.
+shopping_lists_changed = Signal()
+
+
+@transaction.atomic
+def refresh_shopping_lists(user_ids, ingredient_ids=None):
+    """Пересчитывает материализованный список покупок пользователей.
+
+    Если ingredient_ids не передан, пересчитываются все ингредиенты.
+    Строки пользователей блокируются, чтобы параллельные изменения
+    списка покупок одного пользователя выполнялись по очереди.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids or ingredient_ids is not None and not ingredient_ids:
+        return
+    list(
+        User.objects.select_for_update()
+        .filter(id__in=user_ids)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    rows = IngredientsRecipe.objects.filter(
+        recipe__shopping_cart__user_id__in=user_ids
+    )
+    if ingredient_ids is not None:
+        items = items.filter(ingredient_id__in=ingredient_ids)
+        rows = rows.filter(ingredient_id__in=ingredient_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row["user_id"],
+            ingredient_id=row["ingredient_id"],
+            amount=row["total"],
+        )
+        for row in rows.values(
+            "ingredient_id", user_id=F("recipe__shopping_cart__user_id")
+        )
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    shopping_lists_changed.send(sender=ShoppingListItem, user_ids=user_ids)
+
+
+def get_recipe_ingredient_ids(recipe_id):
+    return set(
+        IngredientsRecipe.objects.filter(recipe_id=recipe_id).values_list(
+            "ingredient_id", flat=True
+        )
+    )
+
+
+def get_recipe_cart_user_ids(recipe_id):
+    return set(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            "user_id", flat=True
+        )
+    )
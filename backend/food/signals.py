@@ -0,0 +1,129 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from food.models import (
+    Favorite,
+    IngredientsRecipe,
+    Recipes,
+    ShoppingCart,
+    User,
+)
+from food.shopping_lists import (
+    get_recipe_cart_user_ids,
+    get_recipe_ingredient_ids,
+    refresh_shopping_lists,
+)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        Recipes.objects.filter(id=instance.recipe_id).update(
+            favorites_count=F("favorites_count") + 1
+        )
+
+
+# post_delete отправляется и тогда, когда строку уже удалил параллельный
+# запрос, поэтому счетчики не опускаются ниже нуля; расхождения
+# исправляет команда recount_counters.
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    Recipes.objects.filter(id=instance.recipe_id).update(
+        favorites_count=Greatest(F("favorites_count") - 1, 0)
+    )
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(id=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_deleted(sender, instance, **kwargs):
+    User.objects.filter(id=instance.author_id).update(
+        recipes_count=Greatest(F("recipes_count") - 1, 0)
+    )
+
+
+# Списки покупок пересчитываются при любом изменении корзины или состава
+# рецепта, в том числе из админки и при каскадном удалении. Массовые
+# операции (bulk_create, bulk_update) сигналов не отправляют, после них
+# refresh_shopping_lists вызывается явно.
+@receiver(pre_save, sender=IngredientsRecipe)
+@receiver(pre_save, sender=ShoppingCart)
+def remember_previous(sender, instance, **kwargs):
+    instance.previous = (
+        sender.objects.filter(pk=instance.pk).first()
+        if instance.pk is not None else None
+    )
+
+
+def refresh_recipe_carts(recipe_id, ingredient_ids):
+    refresh_shopping_lists(get_recipe_cart_user_ids(recipe_id), ingredient_ids)
+
+
+@receiver(post_save, sender=IngredientsRecipe)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    previous = getattr(instance, "previous", None)
+    if previous is not None and (
+        previous.recipe_id != instance.recipe_id
+        or previous.ingredient_id != instance.ingredient_id
+    ):
+        refresh_recipe_carts(previous.recipe_id, {previous.ingredient_id})
+    refresh_recipe_carts(instance.recipe_id, {instance.ingredient_id})
+
+
+@receiver(post_delete, sender=IngredientsRecipe)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    refresh_recipe_carts(instance.recipe_id, {instance.ingredient_id})
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_saved(sender, instance, **kwargs):
+    previous = getattr(instance, "previous", None)
+    if previous is not None and (
+        previous.user_id != instance.user_id
+        or previous.recipe_id != instance.recipe_id
+    ):
+        refresh_shopping_lists(
+            (previous.user_id,), get_recipe_ingredient_ids(previous.recipe_id)
+        )
+    refresh_shopping_lists(
+        (instance.user_id,), get_recipe_ingredient_ids(instance.recipe_id)
+    )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_deleted(sender, instance, **kwargs):
+    refresh_shopping_lists(
+        (instance.user_id,), get_recipe_ingredient_ids(instance.recipe_id)
+    )
+
+
+# При удалении рецепта его ингредиенты и корзины удаляются каскадом
+# раньше самого рецепта, поэтому затронутые списки запоминаются до
+# удаления и пересчитываются после него.
+@receiver(pre_delete, sender=Recipes)
+def recipe_deleting(sender, instance, **kwargs):
+    instance.shopping_lists = (
+        get_recipe_cart_user_ids(instance.id),
+        get_recipe_ingredient_ids(instance.id),
+    )
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_shopping_lists_deleted(sender, instance, **kwargs):
+    user_ids, ingredient_ids = getattr(
+        instance, "shopping_lists", ((), ())
+    )
+    refresh_shopping_lists(user_ids, ingredient_ids)
@@ -0,0 +1,55 @@
+import os
+from hashlib import sha256
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит загруженные файлы под именем, равным хэшу содержимого.
+
+    Файлы раскладываются по каталогам из первых символов хэша. Если файл
+    с таким содержимым уже есть, повторная запись не выполняется (у файла
+    только обновляется время изменения), и одинаковые картинки разных
+    рецептов занимают место один раз.
+    """
+
+    shard_depth = 2
+    shard_width = 2
+
+    def get_content_name(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        shards = [
+            hexdigest[index:index + self.shard_width]
+            for index in range(
+                0, self.shard_depth * self.shard_width, self.shard_width
+            )
+        ]
+        ext = os.path.splitext(name)[1].lower()
+        return "/".join(shards + [hexdigest + ext])
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            # Обновленное время изменения защищает файл от удаления
+            # release_images и collect_orphaned_media, пока рецепт,
+            # которому он достался, еще не сохранен.
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        return super().save(name, content, max_length)
+
+    def save_exact(self, name, content):
+        """Сохраняет файл под указанным именем, например копию картинки,
+        имя которой уже выведено из хэша оригинала."""
+        return super().save(name, content)
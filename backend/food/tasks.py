@@ -0,0 +1,44 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundPool:
+    """Пул потоков процесса для работы, которую не нужно выполнять
+    в запросе. Потоки создаются при первой задаче, уже после fork."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def run(self, func, *args):
+        close_old_connections()
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Ошибка фоновой задачи %s%r", func.__name__, args)
+        finally:
+            close_old_connections()
+
+    def submit(self, func, *args):
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix=self.name,
+                    )
+        return self.executor.submit(self.run, func, *args)
+
+    def shutdown(self):
+        """Дожидается завершения поставленных задач."""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
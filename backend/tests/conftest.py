@@ -0,0 +1,98 @@
+from django.core.cache import cache
+
+import pytest
+from rest_framework.test import APIClient
+
+from food.models import (
+    Favorite,
+    Ingredients,
+    IngredientsRecipe,
+    Recipes,
+    ShoppingCart,
+    Subscriptions,
+    Tag,
+    User,
+)
+
+RECIPES_NUMBER = 25
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def users(db):
+    return [
+        User.objects.create_user(
+            username=f"user{index}",
+            email=f"user{index}@example.com",
+            password="password",
+            first_name="Имя",
+            last_name="Фамилия",
+        )
+        for index in range(3)
+    ]
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(
+            name=f"Тег {index}", color=f"#00000{index}", slug=f"tag{index}"
+        )
+        for index in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredients.objects.create(
+            name=f"Ингредиент {index}", measurement_unit="г"
+        )
+        for index in range(4)
+    ]
+
+
+@pytest.fixture
+def recipes(users, tags, ingredients):
+    """Рецепты двух авторов со всеми тегами и ингредиентами; первый
+    пользователь подписан на второго, половина рецептов у него в
+    избранном и в списке покупок."""
+    reader, first, second = users
+    result = []
+    for index in range(RECIPES_NUMBER):
+        recipe = Recipes.objects.create(
+            author=first if index % 2 else second,
+            name=f"Рецепт {index}",
+            image=f"recipes/{index}.png",
+            text="Описание",
+            cooking_time=10,
+        )
+        recipe.tags.set(tags)
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        if index % 2:
+            Favorite.objects.create(user=reader, recipe=recipe)
+            ShoppingCart.objects.create(user=reader, recipe=recipe)
+        result.append(recipe)
+    Subscriptions.objects.create(user=reader, author=second)
+    return result
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(users):
+    client = APIClient()
+    client.force_authenticate(users[0])
+    return client
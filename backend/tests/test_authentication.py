@@ -0,0 +1,61 @@
+from django.core.cache import cache
+
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import TOKEN_KEY, tokens
+
+ME_URL = "/api/users/me/"
+
+
+# Кэш токенов сбрасывается в transaction.on_commit, поэтому тестам нужна
+# настоящая фиксация транзакций.
+@pytest.fixture
+def token(transactional_db, users):
+    return Token.objects.create(user=users[0])
+
+
+@pytest.fixture
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    assert client.get(ME_URL).status_code == 200
+    return client
+
+
+def is_cached(key):
+    return (
+        tokens.get(key) is not None
+        and cache.get(TOKEN_KEY.format(key)) is not None
+    )
+
+
+def test_logout_rejects_next_request(token, token_client):
+    assert is_cached(token.key)
+    response = token_client.post("/api/auth/token/logout/")
+    assert response.status_code == 204
+    assert not is_cached(token.key)
+    assert token_client.get(ME_URL).status_code == 401
+
+
+def test_password_change_drops_cached_user(token, token_client):
+    user = token.user
+    user.set_password("new-password")
+    user.save()
+    assert not is_cached(token.key)
+    assert token_client.get(ME_URL).status_code == 200
+
+
+def test_deactivation_rejects_next_request(token, token_client):
+    user = token.user
+    user.is_active = False
+    user.save(update_fields=("is_active",))
+    assert not is_cached(token.key)
+    assert token_client.get(ME_URL).status_code == 401
+
+
+def test_last_login_update_keeps_cached_user(token, token_client):
+    user = token.user
+    user.save(update_fields=("last_login",))
+    assert is_cached(token.key)
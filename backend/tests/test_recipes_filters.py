@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from food.models import Favorite, Recipes, ShoppingCart
+
+FLAGS = "is_favorited=1&is_in_shopping_cart=1"
+TAGS = "tags=tag0&tags=tag1&tags=tag2"
+RELATION_TABLES = (
+    Favorite._meta.db_table,
+    ShoppingCart._meta.db_table,
+    Recipes.tags.through._meta.db_table,
+)
+
+
+def get_filtered(client, query):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(f"/api/recipes/?limit=50&{query}")
+    assert response.status_code == 200
+    return response.json(), [item["sql"] for item in context]
+
+
+def assert_no_joins(queries):
+    """Фильтры по связям выражены через EXISTS: в запросах COUNT и
+    страницы нет ни JOIN с таблицами связей, ни DISTINCT для
+    устранения дублей."""
+    recipe_queries = [
+        sql for sql in queries
+        if f'FROM "{Recipes._meta.db_table}"' in sql and "EXISTS" in sql
+    ]
+    assert len(recipe_queries) == 2
+    for sql in recipe_queries:
+        assert "DISTINCT" not in sql.upper()
+        for table in RELATION_TABLES:
+            assert f'JOIN "{table}"' not in sql
+
+
+@pytest.mark.parametrize(
+    "query",
+    (
+        FLAGS,
+        TAGS,
+        f"{FLAGS}&{TAGS}",
+        f"{FLAGS}&{TAGS}&tags_mode=all",
+    ),
+)
+def test_relation_filters_use_exists(recipes, user_client, query):
+    data, queries = get_filtered(user_client, query)
+    assert_no_joins(queries)
+    ids = [recipe["id"] for recipe in data["results"]]
+    assert len(ids) == len(set(ids)) == data["count"]
+
+
+def test_combined_filters_return_each_recipe_once(recipes, user_client):
+    data, _ = get_filtered(user_client, f"{FLAGS}&{TAGS}")
+    expected = {recipe.id for index, recipe in enumerate(recipes) if index % 2}
+    assert {recipe["id"] for recipe in data["results"]} == expected
+    assert data["count"] == len(expected)
+
+
+def test_query_count_does_not_depend_on_tags_number(recipes, user_client):
+    _, one_tag = get_filtered(user_client, f"{FLAGS}&tags=tag0")
+    _, all_tags = get_filtered(user_client, f"{FLAGS}&{TAGS}&tags_mode=all")
+    assert len(one_tag) == len(all_tags)
@@ -0,0 +1,64 @@
+import pytest
+
+# COUNT и страница; для рецептов без закэшированного представления
+# еще перечитывание строк и выборки тегов и ингредиентов.
+LIST_QUERIES_COLD = 5
+LIST_QUERIES_WARM = 2
+DETAIL_QUERIES_COLD = 4
+DETAIL_QUERIES_WARM = 1
+
+CLIENTS = ("client", "user_client")
+
+
+@pytest.mark.parametrize("client_name", CLIENTS)
+@pytest.mark.parametrize("limit", (2, 20))
+def test_list_queries_do_not_depend_on_page_size(
+    request, recipes, django_assert_num_queries, client_name, limit
+):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+    client = request.getfixturevalue(client_name)
+    url = f"/api/recipes/?limit={limit}"
+    with django_assert_num_queries(LIST_QUERIES_COLD):
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == limit
+    with django_assert_num_queries(LIST_QUERIES_WARM):
+        assert client.get(url).json() == response.json()
+
+
+@pytest.mark.parametrize("client_name", CLIENTS)
+def test_detail_queries(
+    request, recipes, django_assert_num_queries, client_name
+):
+    client = request.getfixturevalue(client_name)
+    url = f"/api/recipes/{recipes[0].id}/"
+    with django_assert_num_queries(DETAIL_QUERIES_COLD):
+        response = client.get(url)
+    assert response.status_code == 200
+    with django_assert_num_queries(DETAIL_QUERIES_WARM):
+        assert client.get(url).json() == response.json()
+
+
+def test_user_flags_are_not_cached(recipes, users, user_client, client):
+    """Флаги пользователя не попадают в общее закэшированное
+    представление рецепта."""
+    recipe = recipes[1]
+    url = f"/api/recipes/{recipe.id}/"
+    data = user_client.get(url).json()
+    assert data["is_favorited"] is True
+    assert data["is_in_shopping_cart"] is True
+    anonymous = client.get(url).json()
+    assert anonymous["is_favorited"] is False
+    assert anonymous["is_in_shopping_cart"] is False
+    assert anonymous["author"]["is_subscribed"] is False
+
+
+def test_image_urls_follow_request_host(recipes, client):
+    """Закэшированное представление не хранит хост первого запроса."""
+    url = f"/api/recipes/{recipes[0].id}/"
+    internal = client.get(url, HTTP_HOST="internal:8000").json()
+    public = client.get(
+        url, HTTP_HOST="foodgram.example.com", secure=True
+    ).json()
+    assert internal["image"].startswith("http://internal:8000/")
+    assert public["image"].startswith("https://foodgram.example.com/")
@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from rest_framework.test import APIClient
+
+from api import uploads
+
+LIMIT = 1024
+
+
+def get_file():
+    return SimpleUploadedFile(
+        "image.png", b"x" * (LIMIT * 4), content_type="image/png"
+    )
+
+
+@mock.patch.object(uploads, "MAX_IMAGE_SIZE", LIMIT)
+def test_recipe_upload_over_limit_returns_413(recipes):
+    client = APIClient()
+    client.force_authenticate(recipes[1].author)
+    response = client.patch(
+        f"/api/recipes/{recipes[1].id}/",
+        {"image": get_file()},
+        format="multipart",
+    )
+    assert response.status_code == 413
+
+
+@mock.patch.object(uploads, "MAX_IMAGE_SIZE", LIMIT)
+def test_limit_applies_only_to_recipes_view(rf):
+    """Обработчик с ограничением не ставится для остальных запросов."""
+    request = rf.post("/admin/food/recipes/add/", {"image": get_file()})
+    assert not any(
+        isinstance(handler, uploads.LimitedTemporaryFileUploadHandler)
+        for handler in request.upload_handlers
+    )
+    assert request.FILES["image"].size == LIMIT * 4